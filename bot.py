@@ -5,7 +5,7 @@ import os
 import json
 import requests
 import logging
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, request, jsonify, render_template, abort, make_response
 from dotenv import load_dotenv
 import ssl
 import urllib3
@@ -19,6 +19,8 @@ import difflib
 import sqlite3
 from collections import defaultdict
 import importlib
+import hmac
+import profiler
 
 def format_timedelta(delta):
     total_seconds = int(delta.total_seconds())
@@ -97,9 +99,13 @@ logger = setup_logging()
 
 app = Flask(__name__)
 
-# Глобальная переменная для хранения состояния пользователей
+# Глобальная переменная для хранения состояния пользователей (ключ: (bot_id, user_id))
 user_sessions = {}
 
+# Общий пул HTTP-соединений для всех ботов процесса
+http_session = requests.Session()
+http_session.verify = False
+
 class UserSession:
     """Класс для управления сессиями пользователей"""
     def __init__(self, user_id):
@@ -116,10 +122,22 @@ class UserSession:
         self.selected_question = None
         self.last_interaction = datetime.datetime.now()
 
+    def node(self):
+        """Текущая позиция в меню: main_menu, category:<ключ> или question:<ключ>:<индекс>"""
+        if self.state == 'category_selected':
+            return f"category:{self.selected_category}"
+        if self.state == 'question_selected':
+            return f"question:{self.selected_category}:{self.selected_question}"
+        return 'main_menu'
+
+    def depth(self):
+        """Глубина навигации: 0 - главное меню, 1 - категория, 2 - вопрос"""
+        return {'category_selected': 1, 'question_selected': 2}.get(self.state, 0)
+
 @app.route('/api/recent-requests', methods=['GET'])
 def api_recent_requests():
     """API для получения последних запросов"""
-    stats = bot.stats_db.get_statistics()
+    stats = bot.stats_db.get_statistics(selected_bot_id())
     return jsonify({
         'recent_requests': [
             {
@@ -140,7 +158,7 @@ def api_uptime():
 @app.route('/api/stats', methods=['GET'])
 def api_stats():
     """API для получения статистики"""
-    stats = bot.stats_db.get_statistics()
+    stats = bot.stats_db.get_statistics(selected_bot_id())
     return jsonify({
         'total_requests': stats['total_requests'],
         'unique_users': stats['unique_users'],
@@ -156,6 +174,36 @@ def api_health():
         'uptime': format_timedelta(datetime.datetime.now() - start_time)
     })     
 
+@app.route('/api/requests', methods=['GET'])
+def api_requests():
+    """API для поиска по истории запросов"""
+    before = request.args.get('before', type=int)
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+
+    result = bot.stats_db.search_requests(
+        query=request.args.get('q', '').strip(),
+        category=request.args.get('category', '').strip(),
+        user=request.args.get('user', '').strip(),
+        before=before,
+        limit=limit,
+        bot_id=selected_bot_id()
+    )
+    return jsonify({
+        'requests': [
+            {
+                'id': req[0],
+                'user_id': req[1],
+                'username': req[2],
+                'question': req[3],
+                'category': req[4] if req[4] else 'N/A',
+                'timestamp': req[5],
+                'response': req[6]
+            }
+            for req in result['requests']
+        ],
+        'next_before': result['next_before']
+    })
+
 class StatisticsDB:
     def __init__(self):
         self.db_path = 'bot_statistics.db'
@@ -189,19 +237,144 @@ class StatisticsDB:
                 FOREIGN KEY (request_id) REFERENCES user_requests (id)
             )
         ''')
-        
+
+        # Миграция: бот, которому адресован запрос (несколько ботов в одном процессе)
+        cursor.execute('PRAGMA table_info(user_requests)')
+        columns = [column[1] for column in cursor.fetchall()]
+        if 'bot_id' not in columns:
+            cursor.execute("ALTER TABLE user_requests ADD COLUMN bot_id TEXT DEFAULT 'default'")
+
+        # Миграция: идентификатор открытого вопроса (ключ категории + индекс вопроса)
+        if 'category_key' not in columns:
+            cursor.execute('ALTER TABLE user_requests ADD COLUMN category_key TEXT')
+        if 'question_index' not in columns:
+            cursor.execute('ALTER TABLE user_requests ADD COLUMN question_index INTEGER')
+
+        # Индексы для фильтрации и постраничной выборки истории
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_requests_bot_id ON user_requests (bot_id, id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_requests_category ON user_requests (category, id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_requests_user_id ON user_requests (user_id, id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_requests_username ON user_requests (username, id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_bot_responses_request_id ON bot_responses (request_id)')
+
+        self.fts_enabled = self._init_search_index(cursor)
+        self._init_aggregates(cursor)
+
         conn.commit()
         conn.close()
+
+    def _init_search_index(self, cursor):
+        """Полнотекстовый индекс по вопросам и ответам базы знаний.
+
+        Индекс без хранения содержимого (content=''): тексты остаются только в
+        user_requests/bot_responses, rowid индекса совпадает с id запроса.
+        Текст меню не индексируется, иначе почти любой запрос совпадал бы с ним.
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'request_search'")
+        exists = cursor.fetchone() is not None
+
+        try:
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS request_search
+                USING fts5(question, answer_text, content='')
+            ''')
+        except sqlite3.OperationalError as e:
+            logger.warning(f"⚠️ FTS5 недоступен, поиск будет работать через LIKE: {e}")
+            return False
+
+        if not exists:
+            # Первичное заполнение индекса для уже накопленной истории
+            history = cursor.connection.execute('''
+                SELECT r.id, r.question,
+                       (SELECT b.response_text FROM bot_responses b
+                        WHERE b.request_id = r.id ORDER BY b.id DESC LIMIT 1)
+                FROM user_requests r
+            ''')
+            cursor.executemany('''
+                INSERT INTO request_search (rowid, question, answer_text)
+                VALUES (?, ?, ?)
+            ''', ((request_id, question or '', self._extract_answer(response_text))
+                  for request_id, question, response_text in history))
+            logger.info(f"🔎 Построен поисковый индекс для {cursor.rowcount} запросов")
+
+        return True
+
+    @staticmethod
+    def _extract_answer(response_text):
+        """Ответ базы знаний из сохраненного текста ответа бота (без меню)"""
+        match = re.search(r'📝 \*\*Ответ:\*\* (.*?)\n\n💡', response_text or '', re.S)
+        return match.group(1) if match else ''
+
+    def _init_aggregates(self, cursor):
+        """Агрегаты по вопросам, пользователям и переходам по меню"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS question_stats (
+                bot_id TEXT,
+                category_key TEXT,
+                question_index INTEGER,
+                hits INTEGER DEFAULT 0,
+                last_seen DATETIME,
+                PRIMARY KEY (bot_id, category_key, question_index)
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_question_stats_hits ON question_stats (bot_id, hits)')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS funnel_stats (
+                bot_id TEXT,
+                from_node TEXT,
+                to_node TEXT,
+                transitions INTEGER DEFAULT 0,
+                PRIMARY KEY (bot_id, from_node, to_node)
+            )
+        ''')
+
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_stats'")
+        exists = cursor.fetchone() is not None
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_stats (
+                bot_id TEXT,
+                user_id TEXT,
+                username TEXT,
+                requests INTEGER DEFAULT 0,
+                questions_opened INTEGER DEFAULT 0,
+                max_depth INTEGER DEFAULT 0,
+                first_seen DATETIME,
+                last_seen DATETIME,
+                PRIMARY KEY (bot_id, user_id)
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_stats_requests ON user_stats (bot_id, requests)')
+
+        if not exists:
+            # Активность пользователей восстанавливается из уже накопленной истории.
+            # Открытые вопросы и глубина по старым запросам неизвестны, поэтому
+            # questions_opened и max_depth начинают считаться с нуля
+            cursor.execute('''
+                INSERT INTO user_stats (bot_id, user_id, username, requests, questions_opened,
+                                        max_depth, first_seen, last_seen)
+                SELECT bot_id, user_id, MAX(username), COUNT(*), 0, 0, MIN(timestamp), MAX(timestamp)
+                FROM user_requests
+                WHERE user_id IS NOT NULL
+                GROUP BY bot_id, user_id
+            ''')
+
+    @staticmethod
+    def _build_match_query(text):
+        """Преобразование пользовательского ввода в безопасный запрос FTS5"""
+        terms = re.findall(r'\w+', text.lower())
+        return ' '.join(f'"{term}"*' for term in terms)
     
-    def log_request(self, user_id, username, question, category):
+    def log_request(self, user_id, username, question, category, bot_id='default'):
         """Логирование запроса пользователя"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute('''
-            INSERT INTO user_requests (user_id, username, question, category)
-            VALUES (?, ?, ?, ?)
-        ''', (user_id, username, question, category))
+            INSERT INTO user_requests (user_id, username, question, category, bot_id)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (user_id, username, question, category, bot_id))
         
         request_id = cursor.lastrowid
         conn.commit()
@@ -209,49 +382,171 @@ class StatisticsDB:
         
         return request_id
     
-    def log_response(self, request_id, response_text, category, has_buttons=False):
+    def _log_navigation(self, cursor, request_id, bot_id, user_id, username, category_key,
+                        question_index, from_node, to_node, depth):
+        """Запись открытого вопроса и инкрементальное обновление агрегатов"""
+        if category_key is not None:
+            cursor.execute('''
+                UPDATE user_requests
+                SET category_key = ?, question_index = ?
+                WHERE id = ?
+            ''', (category_key, question_index, request_id))
+
+        # Вопрос считается открытым только при переходе к нему
+        opened = question_index is not None and from_node != to_node
+        if opened:
+            cursor.execute('''
+                INSERT INTO question_stats (bot_id, category_key, question_index, hits, last_seen)
+                VALUES (?, ?, ?, 1, CURRENT_TIMESTAMP)
+                ON CONFLICT (bot_id, category_key, question_index)
+                DO UPDATE SET hits = hits + 1, last_seen = CURRENT_TIMESTAMP
+            ''', (bot_id, category_key, question_index))
+
+        if from_node != to_node:
+            cursor.execute('''
+                INSERT INTO funnel_stats (bot_id, from_node, to_node, transitions)
+                VALUES (?, ?, ?, 1)
+                ON CONFLICT (bot_id, from_node, to_node)
+                DO UPDATE SET transitions = transitions + 1
+            ''', (bot_id, from_node, to_node))
+
+        cursor.execute('''
+            INSERT INTO user_stats (bot_id, user_id, username, requests, questions_opened,
+                                    max_depth, first_seen, last_seen)
+            VALUES (?, ?, ?, 1, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+            ON CONFLICT (bot_id, user_id)
+            DO UPDATE SET username = excluded.username,
+                          requests = requests + 1,
+                          questions_opened = questions_opened + excluded.questions_opened,
+                          max_depth = MAX(max_depth, excluded.max_depth),
+                          last_seen = CURRENT_TIMESTAMP
+        ''', (bot_id, user_id, username, 1 if opened else 0, depth))
+
+    def get_question_stats(self, bot_id, limit=20):
+        """Самые открываемые вопросы из агрегата question_stats"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
-        
+
         cursor.execute('''
-            INSERT INTO bot_responses (request_id, response_text, category, has_buttons)
-            VALUES (?, ?, ?, ?)
-        ''', (request_id, response_text, category, 1 if has_buttons else 0))
-        
-        conn.commit()
+            SELECT category_key, question_index, hits, last_seen
+            FROM question_stats
+            WHERE bot_id = ?
+            ORDER BY hits DESC
+            LIMIT ?
+        ''', (bot_id, limit))
+        question_stats = cursor.fetchall()
+
+        cursor.execute('''
+            SELECT from_node, to_node, transitions
+            FROM funnel_stats
+            WHERE bot_id = ?
+            ORDER BY transitions DESC
+        ''', (bot_id,))
+        funnel_stats = cursor.fetchall()
+
         conn.close()
+
+        return {
+            'question_stats': question_stats,
+            'funnel_stats': funnel_stats
+        }
+
+    def get_user_stats(self, bot_id, limit=20):
+        """Самые активные пользователи из агрегата user_stats"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT user_id, username, requests, questions_opened, max_depth, first_seen, last_seen
+            FROM user_stats
+            WHERE bot_id = ?
+            ORDER BY requests DESC
+            LIMIT ?
+        ''', (bot_id, limit))
+        user_stats = cursor.fetchall()
+
+        conn.close()
+
+        return user_stats
+
+    def log_response(self, request_id, response_text, category, has_buttons=False,
+                     answer_text='', navigation=None):
+        """Запись ответа бота вместе с категорией запроса, поисковым индексом
+        и агрегатами навигации в одной транзакции"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                cursor = conn.cursor()
+
+                # Ошибочные запросы остаются без категории
+                if category != 'error':
+                    cursor.execute('''
+                        UPDATE user_requests 
+                        SET category = ? 
+                        WHERE id = ?
+                    ''', (category, request_id))
+
+                cursor.execute('''
+                    INSERT INTO bot_responses (request_id, response_text, category, has_buttons)
+                    VALUES (?, ?, ?, ?)
+                ''', (request_id, response_text, category, 1 if has_buttons else 0))
+
+                # Запрос попадает в поисковый индекс один раз, вместе с ответом
+                if self.fts_enabled:
+                    cursor.execute('''
+                        INSERT INTO request_search (rowid, question, answer_text)
+                        SELECT id, COALESCE(question, ''), ? FROM user_requests WHERE id = ?
+                    ''', (answer_text, request_id))
+
+                if navigation is not None:
+                    self._log_navigation(cursor, request_id, **navigation)
+        finally:
+            conn.close()
     
-    def get_statistics(self):
-        """Получение статистики"""
+    def get_statistics(self, bot_id=None):
+        """Получение статистики (по всем ботам или по одному)"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
+
+        bot_filter = 'AND bot_id = ?' if bot_id else ''
+        params = (bot_id,) if bot_id else ()
         
         # Общее количество запросов
-        cursor.execute('SELECT COUNT(*) FROM user_requests')
+        cursor.execute(f'SELECT COUNT(*) FROM user_requests WHERE 1 = 1 {bot_filter}', params)
         total_requests = cursor.fetchone()[0]
         
         # Количество запросов по категориям
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT category, COUNT(*) 
             FROM user_requests 
-            WHERE category IS NOT NULL 
+            WHERE category IS NOT NULL {bot_filter}
             GROUP BY category 
             ORDER BY COUNT(*) DESC
-        ''')
+        ''', params)
         category_stats = cursor.fetchall()
         
         # Количество уникальных пользователей
-        cursor.execute('SELECT COUNT(DISTINCT user_id) FROM user_requests')
+        cursor.execute(f'SELECT COUNT(DISTINCT user_id) FROM user_requests WHERE 1 = 1 {bot_filter}', params)
         unique_users = cursor.fetchone()[0]
         
         # Последние запросы
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT username, question, category, timestamp 
             FROM user_requests 
-            ORDER BY timestamp DESC 
+            WHERE 1 = 1 {bot_filter}
+            ORDER BY id DESC 
             LIMIT 10
-        ''')
+        ''', params)
         recent_requests = cursor.fetchall()
+
+        # Разбивка по ботам
+        cursor.execute('''
+            SELECT bot_id, COUNT(*), COUNT(DISTINCT user_id)
+            FROM user_requests
+            GROUP BY bot_id
+            ORDER BY COUNT(*) DESC
+        ''')
+        bot_stats = cursor.fetchall()
         
         conn.close()
         
@@ -259,33 +554,109 @@ class StatisticsDB:
             'total_requests': total_requests,
             'unique_users': unique_users,
             'category_stats': category_stats,
-            'recent_requests': recent_requests
+            'recent_requests': recent_requests,
+            'bot_stats': bot_stats
+        }
+
+    def search_requests(self, query=None, category=None, user=None, before=None, limit=50, bot_id=None):
+        """Поиск по истории запросов с постраничной выборкой по id"""
+        conditions = []
+        params = []
+
+        match_query = self._build_match_query(query) if query else ''
+        if query and not match_query:
+            # В запросе нет ни одного слова: искать нечего
+            return {'requests': [], 'next_before': None}
+
+        if match_query and self.fts_enabled:
+            source = 'request_search s JOIN user_requests r ON r.id = s.rowid'
+            conditions.append('request_search MATCH ?')
+            params.append(match_query)
+            order_column = 's.rowid'
+        else:
+            source = 'user_requests r'
+            order_column = 'r.id'
+            if match_query:
+                escaped = re.sub(r'([\\%_])', r'\\\1', query)
+                conditions.append("r.question LIKE ? ESCAPE '\\'")
+                params.append(f'%{escaped}%')
+
+        if category == 'error':
+            # Ошибочные запросы сохраняются без категории (см. process_question)
+            conditions.append('r.category IS NULL')
+        elif category:
+            conditions.append('r.category = ?')
+            params.append(category)
+
+        if user:
+            conditions.append('(r.user_id = ? OR r.username = ?)')
+            params.extend([user, user])
+
+        if bot_id:
+            conditions.append('r.bot_id = ?')
+            params.append(bot_id)
+
+        if before is not None:
+            conditions.append(f'{order_column} < ?')
+            params.append(before)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        # Берем на одну запись больше, чтобы понять, есть ли следующая страница
+        cursor.execute(f'''
+            SELECT r.id, r.user_id, r.username, r.question, r.category, r.timestamp,
+                   (SELECT b.response_text FROM bot_responses b
+                    WHERE b.request_id = r.id ORDER BY b.id DESC LIMIT 1)
+            FROM {source}
+            {where}
+            ORDER BY {order_column} DESC
+            LIMIT ?
+        ''', params + [limit + 1])
+        rows = cursor.fetchall()
+
+        conn.close()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        return {
+            'requests': rows,
+            'next_before': rows[-1][0] if has_more else None
         }
 
 class SynologyChatBot:
-    def __init__(self):
-        # Чтение настроек из .env файла
-        self.incoming_url = os.getenv('SYNOLOGY_INCOMING_URL', 'ввести url')
-        self.bot_name = os.getenv('BOT_NAME', 'ИнструкторБот')
+    def __init__(self, bot_id: str = 'default', bot_name: Optional[str] = None,
+                 incoming_url: Optional[str] = None, token: Optional[str] = None,
+                 knowledge_module: str = 'knowledge_base',
+                 stats_db: Optional[StatisticsDB] = None):
+        # Чтение настроек (по умолчанию из .env файла)
+        self.bot_id = bot_id
+        self.incoming_url = incoming_url or os.getenv('SYNOLOGY_INCOMING_URL', 'ввести url')
+        self.bot_name = bot_name or os.getenv('BOT_NAME', 'ИнструкторБот')
+        self.token = token if token is not None else os.getenv('SYNOLOGY_TOKEN', '')
         self.port = os.getenv('FLASK_PORT', '5000')
+        self.knowledge_module = knowledge_module
         
-        # Инициализация базы данных статистики
-        self.stats_db = StatisticsDB()
+        # База данных статистики (общая для всех ботов процесса)
+        self.stats_db = stats_db or StatisticsDB()
         
         # База знаний с расширенными ключевыми словами
         self.knowledge_base = self._setup_knowledge_base()
         
-        logger.info(f"🎯 Бот '{self.bot_name}' успешно инициализирован")
+        logger.info(f"🎯 Бот '{self.bot_name}' ({self.bot_id}) успешно инициализирован")
         logger.info(f"🔗 Входящий URL: {self.incoming_url[:50]}...")
 
     def _setup_knowledge_base(self) -> Dict:
         """Загрузка базы знаний из внешнего файла"""
         try:
             # Попробуем импортировать базу знаний из отдельного файла
-            import knowledge_base
-            importlib.reload(knowledge_base)  # Перезагружаем модуль на случай изменений
-            logger.info("✅ База знаний успешно загружена из knowledge_base.py")
-            return knowledge_base.knowledge_base
+            module = importlib.import_module(self.knowledge_module)
+            importlib.reload(module)  # Перезагружаем модуль на случай изменений
+            logger.info(f"✅ База знаний успешно загружена из {self.knowledge_module}.py")
+            return module.knowledge_base
         except ImportError as e:
             logger.error(f"❌ Ошибка загрузки базы знаний: {e}")
             logger.warning("⚠️ Используется встроенная база знаний по умолчанию")
@@ -330,12 +701,9 @@ class SynologyChatBot:
         }
         
         try:
-            session = requests.Session()
-            session.verify = False
+            logger.info(f"📤 Отправка сообщения в Synology Chat ({self.bot_id})...")
             
-            logger.info(f"📤 Отправка сообщения в Synology Chat...")
-            
-            response = session.post(
+            response = http_session.post(
                 self.incoming_url,
                 data=payload,
                 timeout=30,
@@ -355,21 +723,6 @@ class SynologyChatBot:
             logger.error(f"❌ Ошибка запроса: {e}")
             return False
 
-    def _update_request_category(self, request_id: int, category: str):
-        """Обновление категории запроса в базе данных"""
-        conn = sqlite3.connect(self.stats_db.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            UPDATE user_requests 
-            SET category = ? 
-            WHERE id = ?
-        ''', (category, request_id))
-        
-        conn.commit()
-        conn.close()
-        logger.info(f"📊 Обновлена категория запроса {request_id} на '{category}'")
-
     def get_main_menu(self):
         """Главное меню с категориями"""
         categories = list(self.knowledge_base.keys())
@@ -426,14 +779,16 @@ class SynologyChatBot:
         # Логирование запроса (изначально без категории)
         request_id = None
         if user_id and username:
-            request_id = self.stats_db.log_request(user_id, username, question, None)
+            request_id = self.stats_db.log_request(user_id, username, question, None, self.bot_id)
         
-        # Получаем или создаем сессию пользователя
-        if user_id not in user_sessions:
-            user_sessions[user_id] = UserSession(user_id)
+        # Получаем или создаем сессию пользователя в пространстве имен бота
+        session_key = (self.bot_id, user_id)
+        if session_key not in user_sessions:
+            user_sessions[session_key] = UserSession(user_id)
         
-        session = user_sessions[user_id]
+        session = user_sessions[session_key]
         session.last_interaction = datetime.datetime.now()
+        previous_node = session.node()
         
         # Обработка специальных команд
         if normalized_question in ['меню', 'menu', 'начать', 'старт', 'start']:
@@ -502,21 +857,148 @@ class SynologyChatBot:
             response_text = self.get_main_menu()
             category = 'main_menu'
         
-        if request_id and category != 'error':
-            self._update_request_category(request_id, category)
-        
         if request_id:
-            self.stats_db.log_response(request_id, response_text, category)
+            answer_text = ''
+            question_index = None
+            if session.state == 'question_selected':
+                question_index = session.selected_question
+                answer_text = self.knowledge_base[session.selected_category]['questions'][question_index]['answer']
+
+            self.stats_db.log_response(request_id, response_text, category,
+                                       answer_text=answer_text,
+                                       navigation={
+                                           'bot_id': self.bot_id,
+                                           'user_id': user_id,
+                                           'username': username,
+                                           'category_key': session.selected_category,
+                                           'question_index': question_index,
+                                           'from_node': previous_node,
+                                           'to_node': session.node(),
+                                           'depth': session.depth()
+                                       })
+            logger.info(f"📊 Запрос {request_id} записан в статистику с категорией '{category}'")
         
         return {'text': response_text, 'category': category}
 
-# Инициализация бота
-bot = SynologyChatBot()
+def config_error(message: str):
+    """Остановка запуска при ошибке в конфигурации ботов"""
+    logger.critical(f"💥 Ошибка конфигурации ботов: {message}")
+    raise SystemExit(1)
+
+def load_bots() -> Dict[str, SynologyChatBot]:
+    """Создание ботов из BOTS_CONFIG (JSON) или одного бота из .env"""
+    stats_db = StatisticsDB()
+    config_path = os.getenv('BOTS_CONFIG') or 'bots.json'
+
+    if not os.path.exists(config_path):
+        return {'default': SynologyChatBot(stats_db=stats_db)}
+
+    try:
+        with open(config_path, encoding='utf-8') as f:
+            config = json.load(f)
+    except json.JSONDecodeError as e:
+        config_error(f"{config_path} содержит некорректный JSON: {e}")
+
+    # Настройки из .env в этом режиме не подставляются: ответы бота без
+    # собственного incoming_url ушли бы в канал другого бота
+    if not isinstance(config, list) or not config:
+        config_error(f"{config_path} должен содержать непустой список ботов")
+
+    for position, entry in enumerate(config, 1):
+        if not isinstance(entry, dict) or not entry.get('id'):
+            config_error(f"{config_path}: у бота №{position} не указан id")
+        if not isinstance(entry['id'], str):
+            config_error(f"{config_path}: id бота №{position} должен быть строкой")
+        if not entry.get('incoming_url'):
+            config_error(f"{config_path}: у бота '{entry['id']}' не указан incoming_url")
+
+    bot_ids = [entry['id'] for entry in config]
+    duplicates = sorted({bot_id for bot_id in bot_ids if bot_ids.count(bot_id) > 1})
+    if duplicates:
+        config_error(f"{config_path}: повторяющиеся id ботов: {', '.join(duplicates)}")
+
+    # Одинаковый токен не дал бы выбрать бота для общего /webhook
+    tokens = [entry['token'] for entry in config if entry.get('token')]
+    shared = sorted(entry['id'] for entry in config
+                    if entry.get('token') and tokens.count(entry['token']) > 1)
+    if shared:
+        config_error(f"{config_path}: у ботов {', '.join(shared)} одинаковый token")
+
+    loaded = {}
+    for entry in config:
+        bot_id = entry['id']
+        loaded[bot_id] = SynologyChatBot(
+            bot_id=bot_id,
+            bot_name=entry.get('name') or bot_id,
+            incoming_url=entry['incoming_url'],
+            token=entry.get('token', ''),
+            knowledge_module=entry.get('knowledge_base', 'knowledge_base'),
+            stats_db=stats_db
+        )
+    logger.info(f"🤖 Загружено ботов из {config_path}: {len(loaded)}")
+    return loaded
+
+def resolve_bot(bot_id: Optional[str], token: Optional[str]) -> Optional[SynologyChatBot]:
+    """Выбор бота по пути /webhook/<bot_id> или по токену исходящего вебхука"""
+    if bot_id is not None:
+        return bots.get(bot_id)
+
+    target = next((b for b in bots.values() if b.token and b.token == token), None)
+    if target is None and len(bots) == 1:
+        target = bot
+    return target
+
+def check_bot_token(target: SynologyChatBot, token: Optional[str]) -> bool:
+    """Проверка токена исходящего вебхука, если он задан для бота"""
+    return not target.token or hmac.compare_digest(token or '', target.token)
+
+# Инициализация ботов; первый бот используется для веб-интерфейса по умолчанию
+bots = load_bots()
+bot = next(iter(bots.values()))
+
+def is_admin_request() -> bool:
+    """Проверка токена администратора из заголовка X-Admin-Token"""
+    admin_token = os.getenv('ADMIN_TOKEN', '')
+    if not admin_token:
+        return False
+    return hmac.compare_digest(request.headers.get('X-Admin-Token', ''), admin_token)
 
 @app.route('/webhook', methods=['POST'])
-def webhook():
+@app.route('/webhook/<bot_id>', methods=['POST'])
+def webhook(bot_id=None):
+    token = request.form.get('token')
+    target = resolve_bot(bot_id, token)
+    if target is None:
+        logger.error(f"❌ Бот для webhook не найден (путь: {bot_id})")
+        return jsonify({"error": "Бот не найден"}), 404
+
+    if not check_bot_token(target, token):
+        logger.warning(f"⚠️ Неверный токен для бота {target.bot_id}")
+        return jsonify({"error": "Неверный токен"}), 403
+
+    if request.headers.get('X-Profile') and is_admin_request():
+        return profiled_webhook(target)
+    return handle_webhook(target)
+
+def profiled_webhook(target):
+    """Обработка webhook под cProfile с отчетом в ответе"""
     try:
-        logger.info("🌐 Получен запрос на webhook")
+        result, report = profiler.profile_call(handle_webhook, target)
+    except profiler.ProfilerBusyError as e:
+        logger.warning(f"⚠️ {e}, webhook обработан без профилирования")
+        return handle_webhook(target)
+
+    logger.info(f"⏱️ Профиль webhook:\n{report}")
+    response = app.make_response(result)
+    if response.is_json:
+        data = response.get_json()
+        data['profile'] = report
+        response.set_data(json.dumps(data, ensure_ascii=False))
+    return response
+
+def handle_webhook(target):
+    try:
+        logger.info(f"🌐 Получен запрос на webhook бота {target.bot_id}")
         
         data = request.form
         
@@ -537,9 +1019,9 @@ def webhook():
         
         logger.info(f"👤 Сообщение от {username} ({user_id}): '{message_text}'")
         
-        response_data = bot.process_question(message_text, user_id, username)
+        response_data = target.process_question(message_text, user_id, username)
         
-        success = bot.send_message(
+        success = target.send_message(
             response_data['text'], 
             user_id, 
             channel
@@ -581,9 +1063,22 @@ def test_bot():
 @app.route('/stats', methods=['GET'])
 def statistics():
     logger.info("📊 Запрос статистики бота")
-    stats = bot.stats_db.get_statistics()
+    selected_bot = selected_bot_id()
+    stats = bot.stats_db.get_statistics(selected_bot)
+    chat_bot = bots.get(selected_bot, bot)
+    top_questions = [
+        (question_title(chat_bot, category_key, question_index) or f"{category_key} #{question_index + 1}",
+         category_key, hits)
+        for category_key, question_index, hits, _ in
+        chat_bot.stats_db.get_question_stats(chat_bot.bot_id, 10)['question_stats']
+    ]
     return render_template('stats.html',
                          stats=stats,
+                         top_questions=top_questions,
+                         top_users=chat_bot.stats_db.get_user_stats(chat_bot.bot_id, 10),
+                         analytics_bot=chat_bot,
+                         bots=bots,
+                         selected_bot=selected_bot,
                          bot_name=bot.bot_name,
                          uptime=format_timedelta(datetime.datetime.now() - start_time),
                          title='Статистика')
@@ -621,7 +1116,7 @@ def send_test_message():
                              
 @app.route('/api/category-stats', methods=['GET'])
 def api_category_stats():
-    stats = bot.stats_db.get_statistics()
+    stats = bot.stats_db.get_statistics(selected_bot_id())
     return jsonify({
         'category_stats': [
             {
@@ -632,6 +1127,104 @@ def api_category_stats():
         ]
     })
 
+@app.route('/api/profile', methods=['POST'])
+def api_profile():
+    """Сэмплирующее профилирование работающего процесса (только для администратора)"""
+    if not is_admin_request():
+        return jsonify({"error": "Доступ запрещен"}), 403
+
+    duration = min(max(request.args.get('seconds', 10, type=float), 0.1), 60)
+    interval = min(max(request.args.get('interval_ms', 5, type=float), 1), 1000) / 1000
+
+    logger.info(f"⏱️ Запуск профилирования на {duration} с")
+    try:
+        collapsed = profiler.sample_stacks(duration, interval)
+    except profiler.ProfilerBusyError as e:
+        return jsonify({"error": str(e)}), 409
+
+    return app.response_class(collapsed, mimetype='text/plain')
+
+@app.route('/api/bot-stats', methods=['GET'])
+def api_bot_stats():
+    """API для получения статистики в разрезе ботов"""
+    stats = bot.stats_db.get_statistics()
+    return jsonify({
+        'bot_stats': [
+            {
+                'bot_id': bot_id,
+                'bot_name': bots[bot_id].bot_name if bot_id in bots else bot_id,
+                'total_requests': total,
+                'unique_users': users
+            }
+            for bot_id, total, users in stats['bot_stats']
+        ]
+    })
+
+def selected_bot_id() -> Optional[str]:
+    """Бот из параметра ?bot=; для неизвестного бота запрос завершается 404"""
+    bot_id = request.args.get('bot', '').strip() or None
+    if bot_id is not None and bot_id not in bots:
+        abort(make_response(jsonify({"error": f"Бот '{bot_id}' не найден"}), 404))
+    return bot_id
+
+def question_title(chat_bot, category_key, question_index):
+    """Текст вопроса по идентификатору из базы знаний бота"""
+    try:
+        return chat_bot.knowledge_base[category_key]['questions'][question_index]['question']
+    except (KeyError, IndexError, TypeError):
+        return None
+
+@app.route('/api/questions', methods=['GET'])
+def api_questions():
+    """API для получения самых открываемых вопросов и переходов по меню"""
+    chat_bot = bots.get(selected_bot_id(), bot)
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 200)
+    stats = chat_bot.stats_db.get_question_stats(chat_bot.bot_id, limit)
+    return jsonify({
+        'bot_id': chat_bot.bot_id,
+        'bot_name': chat_bot.bot_name,
+        'questions': [
+            {
+                'category_key': category_key,
+                'question_index': question_index,
+                'question': question_title(chat_bot, category_key, question_index),
+                'hits': hits,
+                'last_seen': last_seen
+            }
+            for category_key, question_index, hits, last_seen in stats['question_stats']
+        ],
+        'funnel': [
+            {
+                'from': from_node,
+                'to': to_node,
+                'transitions': transitions
+            }
+            for from_node, to_node, transitions in stats['funnel_stats']
+        ]
+    })
+
+@app.route('/api/users', methods=['GET'])
+def api_users():
+    """API для получения самых активных пользователей"""
+    chat_bot = bots.get(selected_bot_id(), bot)
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 200)
+    return jsonify({
+        'bot_id': chat_bot.bot_id,
+        'bot_name': chat_bot.bot_name,
+        'users': [
+            {
+                'user_id': user[0],
+                'username': user[1],
+                'requests': user[2],
+                'questions_opened': user[3],
+                'max_depth': user[4],
+                'first_seen': user[5],
+                'last_seen': user[6]
+            }
+            for user in chat_bot.stats_db.get_user_stats(chat_bot.bot_id, limit)
+        ]
+    })
+
 templates_dir = os.path.join(os.path.dirname(__file__), 'templates')
 os.makedirs(templates_dir, exist_ok=True)
 
@@ -644,6 +1237,9 @@ if __name__ == '__main__':
     
     logger.info(f"🚀 Запуск {bot.bot_name} на {host}:{port}")
     logger.info(f"🌐 Webhook конечная точка: http://{host}:{port}/webhook")
+    if len(bots) > 1:
+        for bot_id, chat_bot in bots.items():
+            logger.info(f"🌐 Webhook бота '{chat_bot.bot_name}': http://{host}:{port}/webhook/{bot_id}")
     logger.info(f"🔍 Проверка работоспособности: http://{host}:{port}/health")
     logger.info(f"🧪 Тест конечной точки: http://{host}:{port}/test")
     logger.info(f"📊 Статистика: http://{host}:{port}/stats")
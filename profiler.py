@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import io
+import sys
+import time
+import threading
+import cProfile
+import pstats
+from collections import Counter
+
+# Одновременно допускается только одно профилирование
+_profile_lock = threading.Lock()
+
+
+class ProfilerBusyError(RuntimeError):
+    """Профилирование уже запущено"""
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapse_stack(frame, thread_name: str) -> str:
+    """Стек потока в формате 'поток;внешняя функция;...;текущая функция'"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.append(thread_name)
+    labels.reverse()
+    return ';'.join(label.replace(';', ',') for label in labels)
+
+
+def sample_stacks(duration: float, interval: float = 0.005) -> str:
+    """Сэмплирующее профилирование всех потоков процесса.
+
+    Возвращает свернутые стеки (collapsed stacks), совместимые с flamegraph.pl
+    и speedscope. Вне вызова никаких хуков в интерпретаторе не остается.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusyError("Профилирование уже выполняется")
+
+    try:
+        own_id = threading.get_ident()
+        samples = Counter()
+        deadline = time.monotonic() + duration
+
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                samples[_collapse_stack(frame, names.get(thread_id, str(thread_id)))] += 1
+            time.sleep(interval)
+
+        return ''.join(f"{stack} {count}\n" for stack, count in samples.most_common())
+    finally:
+        _profile_lock.release()
+
+
+def profile_call(func, *args, **kwargs):
+    """Детерминированное профилирование одного вызова через cProfile"""
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusyError("Профилирование уже выполняется")
+
+    try:
+        profile = cProfile.Profile()
+        result = profile.runcall(func, *args, **kwargs)
+    finally:
+        _profile_lock.release()
+
+    output = io.StringIO()
+    pstats.Stats(profile, stream=output).sort_stats('cumulative').print_stats(40)
+    return result, output.getvalue()